@@ -14,41 +14,154 @@ Env:
 from __future__ import annotations
 
 import argparse
+import concurrent.futures
 import datetime as _dt
+import functools
+import hashlib
+import json
 import math
 import os
+import string
 import sys
-from dataclasses import dataclass
+import time
 from typing import List, Optional, Tuple
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
-GQL_ENDPOINT = "https://api.github.com/graphql"
+try:  # optional — the workflow only installs requests
+    import numpy as _np
+except ImportError:
+    _np = None
 
+try:  # optional — 2-5x faster parse of large GraphQL pages
+    import orjson
+    _loads = orjson.loads
+    _dumps = orjson.dumps  # bytes
+except ImportError:
+    _loads = json.loads
 
-@dataclass
-class Metrics:
-    updated: str
-    stars: int
-    commits_year: int
-    prs_year: int
-    issues_year: int
-    contrib_year: int
-    days_year: List[Tuple[str, int]]
-    days_30: List[Tuple[str, int]]
+    def _dumps(obj) -> bytes:  # match orjson's bytes contract
+        return json.dumps(obj, separators=(",", ":")).encode("utf-8")
 
+GQL_ENDPOINT = "https://api.github.com/graphql"
 
-def gql(token: str, query: str, variables: dict) -> dict:
-    headers = {"Authorization": f"Bearer {token}", "Accept": "application/vnd.github+json"}
-    r = requests.post(GQL_ENDPOINT, json={"query": query, "variables": variables}, headers=headers, timeout=30)
+# One keep-alive connection reused across every GraphQL call; without it each
+# page of repo pagination pays a fresh TCP+TLS handshake to api.github.com.
+_SESSION = requests.Session()
+# Explicit, so a future header rewrite can't silently drop compression: the
+# year calendar compresses ~5-10x.
+_SESSION.headers["Accept-Encoding"] = "gzip, deflate"
+# Bodies are pre-serialized with _dumps (orjson when available), so requests'
+# per-call json= encoding is bypassed.
+_SESSION.headers["Content-Type"] = "application/json"
+_SESSION.mount(
+    "https://",
+    HTTPAdapter(
+        pool_connections=1,
+        pool_maxsize=4,
+        # POST is not retried by default; GraphQL queries are safe to repeat.
+        # 403/429 from abuse detection carry Retry-After, which Retry honors.
+        max_retries=Retry(
+            total=5,
+            backoff_factor=1.5,
+            status_forcelist=[429, 502, 503, 504],
+            allowed_methods=["POST"],
+            respect_retry_after_header=True,
+        ),
+    ),
+)
+
+
+# Conditional-request cache directory (--cache-dir). When set, gql() stores
+# {etag, ts, data} per (query, variables) and replays cached data on HTTP 304,
+# so scheduled re-runs with unchanged upstream state skip body downloads.
+_CACHE_DIR: Optional[str] = None
+
+
+def _cache_path(query: str, variables: dict) -> str:
+    key = hashlib.sha256((query + json.dumps(variables, sort_keys=True)).encode("utf-8")).hexdigest()
+    return os.path.join(_CACHE_DIR, key + ".json")
+
+
+def gql(query: str, variables: dict) -> dict:
+    # Auth headers live on _SESSION (set once in build_metrics).
+    cache_path = None
+    cached = None
+    headers = {}
+    if _CACHE_DIR:
+        cache_path = _cache_path(query, variables)
+        try:
+            with open(cache_path, "r", encoding="utf-8") as f:
+                cached = json.load(f)
+        except (OSError, ValueError):
+            cached = None
+        if cached and cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+    r = _SESSION.post(GQL_ENDPOINT, data=_dumps({"query": query, "variables": variables}),
+                      headers=headers or None, timeout=30)
+    if os.environ.get("METRICS_DEBUG"):
+        print(
+            f"DEBUG: gql status={r.status_code} encoding={r.headers.get('Content-Encoding')} bytes={len(r.content)}",
+            file=sys.stderr,
+        )
+    if r.status_code == 304 and cached:
+        return cached["data"]
     r.raise_for_status()
-    data = r.json()
+    data = _loads(r.content)
     if "errors" in data:
         raise RuntimeError(f"GraphQL errors: {data['errors']}")
-    return data["data"]
-
-
-def fetch_contrib_window(token: str, user: str, date_from: str, date_to: str):
+    data = data["data"]
+    # Back off before the next paging call once the point budget is nearly
+    # gone, instead of burning the last points and failing the run on 403.
+    try:
+        remaining = int(r.headers.get("X-RateLimit-Remaining", ""))
+    except ValueError:
+        remaining = None
+    if remaining is not None and remaining < 5:
+        wait = max(0.0, int(r.headers.get("X-RateLimit-Reset") or 0) - time.time())
+        if wait:
+            print(f"WARN: {remaining} rate-limit points left; sleeping {wait:.0f}s until reset", file=sys.stderr)
+            time.sleep(wait)
+    etag = r.headers.get("ETag")
+    if cache_path and etag:
+        tmp = cache_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"etag": etag, "ts": time.time(), "data": data}, f)
+        os.replace(tmp, cache_path)  # atomic; concurrent pagers touch distinct keys
+    return data
+
+
+def _calendar_days(cal: dict) -> Tuple[List[str], List[int]]:
+    # SoA split: every numeric consumer (streaks, active days, sparkline)
+    # only touches counts; dates are needed solely to label streak ranges.
+    # contributionCalendar.weeks[].contributionDays[] is documented to be
+    # chronological, so no re-sort is needed.
+    days = [
+        (day["date"], int(day.get("contributionCount") or 0))
+        for w in (cal.get("weeks") or [])
+        for day in (w.get("contributionDays") or [])
+    ]
+    return [d for d, _ in days], [c for _, c in days]
+
+
+def fetch_contrib_window(user: str, date_from: str, date_to: str,
+                         repos_affiliations: Optional[str] = None):
+    # The optional repositories block rides along in the same GraphQL document
+    # so the whole fetch is one round-trip: the first page feeds
+    # fetch_total_stars. The 30-day sparkline window is sliced from the year
+    # calendar by the caller rather than fetched as a second selection.
+    repos_block = ""
+    if repos_affiliations:
+        repos_block = r"""
+        repositories(first: 100, ownerAffiliations: OWNER_AFFILIATIONS, isFork:false,
+          orderBy: {field: STARGAZERS, direction: DESC}) {
+          totalCount
+          pageInfo { hasNextPage endCursor }
+          nodes { id stargazerCount pushedAt }
+        }
+        """.replace("OWNER_AFFILIATIONS", repos_affiliations)
     query = r"""
     query($login:String!, $from:DateTime!, $to:DateTime!) {
       user(login:$login) {
@@ -61,143 +174,226 @@ def fetch_contrib_window(token: str, user: str, date_from: str, date_to: str):
             weeks { contributionDays { date contributionCount } }
           }
         }
+        REPOS_BLOCK
       }
     }
-    """
-    d = gql(token, query, {"login": user, "from": date_from, "to": date_to})
+    """.replace("REPOS_BLOCK", repos_block)
+    query = " ".join(query.split())  # collapse indentation; smaller POST body
+    d = gql(query, {"login": user, "from": date_from, "to": date_to})
     cc = d["user"]["contributionsCollection"]
     cal = cc["contributionCalendar"]
-    days = []
-    for w in cal["weeks"]:
-        for day in w["contributionDays"]:
-            days.append((day["date"], int(day["contributionCount"])))
-    days.sort(key=lambda x: x[0])
+    dates, counts = _calendar_days(cal)
     return (
         int(cal["totalContributions"]),
         int(cc["totalCommitContributions"]),
         int(cc["totalPullRequestContributions"]),
         int(cc["totalIssueContributions"]),
-        days,
+        dates,
+        counts,
+        d["user"].get("repositories"),
     )
 
 
-def fetch_total_stars(token: str, user: str, scope: str = "affiliated") -> int:
+SCOPE_AFFILIATIONS = {
+    "owned": "[OWNER]",
+    "affiliated": "[OWNER, ORGANIZATION_MEMBER, COLLABORATOR]",
+    "all": "[OWNER, ORGANIZATION_MEMBER, COLLABORATOR]",
+}
+
+# Pager query texts, whitespace-collapsed once at import; only the
+# affiliations placeholder is substituted per call.
+_Q_REPOS_PAGE = " ".join(r'''
+query($login:String!, $after:String) {
+  user(login:$login) {
+    repositories(first: 100, after: $after,
+      ownerAffiliations: OWNER_AFFILIATIONS,
+      isFork:false,
+      orderBy: {field: STARGAZERS, direction: DESC}) {
+      pageInfo { hasNextPage endCursor }
+      nodes { id stargazerCount }
+    }
+  }
+}
+'''.split())
+
+_Q_CONTRIBUTED_PAGE = " ".join(r'''
+query($login:String!, $after:String) {
+  user(login:$login) {
+    repositoriesContributedTo(first: 100, after: $after, includeUserRepositories: true) {
+      pageInfo { hasNextPage endCursor }
+      nodes { id stargazerCount isFork }
+    }
+  }
+}
+'''.split())
+
+
+def fetch_total_stars(user: str, scope: str = "affiliated", first_page: Optional[dict] = None) -> int:
     # Sum of stargazerCount across repositories (current stars), NOT "repos you starred".
     # scope: owned | affiliated | contributed | all
+    # first_page: a repositories connection prefetched by fetch_contrib_window
+    # (must have been queried with the same affiliations as the scope implies).
+    # With a cache dir and a prefetched first page we can fingerprint the repo
+    # set (totalCount + page-1 nodes incl. pushedAt) and reuse the previous
+    # aggregate: unchanged fingerprint => skip pages 2..N entirely. Star-count
+    # drift outside page 1 is the accepted staleness window of the heuristic.
+    agg_path = None
+    if _CACHE_DIR and first_page is not None:
+        fp = hashlib.sha256(json.dumps(
+            {"user": user, "scope": scope,
+             "totalCount": first_page.get("totalCount"),
+             "nodes": first_page.get("nodes")},
+            sort_keys=True).encode("utf-8")).hexdigest()
+        agg_path = os.path.join(_CACHE_DIR, f"stars-{fp}.json")
+        try:
+            with open(agg_path, "r", encoding="utf-8") as f:
+                return int(json.load(f)["total"])
+        except (OSError, ValueError, KeyError):
+            pass
+
     seen_ids = set()
     total = 0
 
     def accumulate(nodes):
         nonlocal total
-        for n in nodes or []:
-            rid = n.get("id")
-            if not rid or rid in seen_ids:
-                continue
-            seen_ids.add(rid)
-            total += int(n.get("stargazerCount") or 0)
+        fresh = [n for n in nodes or [] if n.get("id") and n["id"] not in seen_ids]
+        seen_ids.update(n["id"] for n in fresh)
+        total += sum(int(n.get("stargazerCount") or 0) for n in fresh)
+
+    def trim_starless(nodes):
+        # Pages arrive in STARGAZERS DESC order, so the first zero-star node
+        # proves every remaining repo in the connection contributes nothing.
+        for i, n in enumerate(nodes or []):
+            if not int(n.get("stargazerCount") or 0):
+                return nodes[:i], True
+        return nodes, False
 
     def page_through_repositories(owner_affiliations):
-        cur = None
-        q = r'''
-        query($login:String!, $after:String) {
-          user(login:$login) {
-            repositories(first: 100, after: $after,
-              ownerAffiliations: OWNER_AFFILIATIONS,
-              isFork:false) {
-              pageInfo { hasNextPage endCursor }
-              nodes { id stargazerCount }
-            }
-          }
-        }
-        '''.replace("OWNER_AFFILIATIONS", owner_affiliations)
-
-        while True:
-            d = gql(token, q, {"login": user, "after": cur})
-            repos = d["user"]["repositories"]
-            accumulate(repos.get("nodes"))
-            pi = repos["pageInfo"]
-            if not pi["hasNextPage"]:
-                break
-            cur = pi["endCursor"]
+        # Returns the nodes of each page; the caller merges them so this can
+        # run on a worker thread without touching shared state. The first page
+        # (prefetched or fetched here) is handled straight-line — accounts
+        # under 100 repos never enter the loop at all.
+        q = _Q_REPOS_PAGE.replace("OWNER_AFFILIATIONS", owner_affiliations)
+        if first_page is not None:
+            conn = first_page
+        else:
+            conn = gql(q, {"login": user, "after": None})["user"]["repositories"]
+        nodes, exhausted = trim_starless(conn.get("nodes"))
+        pages = [nodes]
+        pi = conn["pageInfo"]
+        while nodes and not exhausted and pi["hasNextPage"]:
+            conn = gql(q, {"login": user, "after": pi["endCursor"]})["user"]["repositories"]
+            nodes, exhausted = trim_starless(conn.get("nodes"))
+            pages.append(nodes)
+            pi = conn["pageInfo"]
+        return pages
 
     def page_through_contributed():
-        cur = None
-        q = r'''
-        query($login:String!, $after:String) {
-          user(login:$login) {
-            repositoriesContributedTo(first: 100, after: $after, includeUserRepositories: true) {
-              pageInfo { hasNextPage endCursor }
-              nodes { id stargazerCount isFork }
-            }
-          }
-        }
-        '''
-        while True:
-            d = gql(token, q, {"login": user, "after": cur})
-            conn = d["user"]["repositoriesContributedTo"]
-            nodes = [n for n in (conn.get("nodes") or []) if not n.get("isFork")]
-            accumulate(nodes)
+        conn = gql(_Q_CONTRIBUTED_PAGE, {"login": user, "after": None})["user"]["repositoriesContributedTo"]
+        pages = [[n for n in (conn.get("nodes") or []) if not n.get("isFork")]]
+        pi = conn["pageInfo"]
+        while conn.get("nodes") and pi["hasNextPage"]:
+            conn = gql(_Q_CONTRIBUTED_PAGE, {"login": user, "after": pi["endCursor"]})["user"]["repositoriesContributedTo"]
+            pages.append([n for n in (conn.get("nodes") or []) if not n.get("isFork")])
             pi = conn["pageInfo"]
-            if not pi["hasNextPage"]:
-                break
-            cur = pi["endCursor"]
+        return pages
 
     if scope not in {"owned", "affiliated", "contributed", "all"}:
         raise ValueError(f"Invalid stars scope: {scope}")
 
-    if scope == "owned":
-        page_through_repositories("[OWNER]")
-        return total
-
-    if scope in {"affiliated", "all"}:
-        page_through_repositories("[OWNER, ORGANIZATION_MEMBER, COLLABORATOR]")
-
+    pagers = []
+    if scope in {"owned", "affiliated", "all"}:
+        pagers.append(lambda: page_through_repositories(SCOPE_AFFILIATIONS[scope]))
     if scope in {"contributed", "all"}:
-        page_through_contributed()
-
+        pagers.append(page_through_contributed)
+
+    if len(pagers) == 1:
+        pages = pagers[0]()
+    else:
+        # The two connection walks are independent cursor chains; run them on
+        # threads (requests releases the GIL during I/O) and merge afterwards.
+        with concurrent.futures.ThreadPoolExecutor(max_workers=4) as ex:
+            futures = [ex.submit(p) for p in pagers]
+            pages = [nodes for f in concurrent.futures.as_completed(futures) for nodes in f.result()]
+
+    for nodes in pages:
+        accumulate(nodes)
+
+    if agg_path:
+        tmp = agg_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"total": total, "ts": time.time()}, f)
+        os.replace(tmp, agg_path)
     return total
 
 
 
 
+@functools.lru_cache(maxsize=256)
 def _fmt_num(x: Optional[int]) -> str:
+    # Integer divmod instead of float format + .replace: the fraction digit
+    # is truncated, so 1049 -> "1k" and 1150 -> "1.1k" with no float rounding.
+    # Pure on a hashable arg, so memoized: renders repeat small values (0, 1)
+    # across the eight per-render call sites.
     if x is None:
         return "—"
     x = int(x)
     if x < 1000:
         return str(x)
     if x < 1_000_000:
-        s = f"{x/1000.0:.1f}k"
-        return s.replace(".0k", "k")
-    s = f"{x/1_000_000.0:.1f}M"
-    return s.replace(".0M", "M")
+        q, r = divmod(x, 1000)
+        return f"{q}k" if r < 100 else f"{q}.{r // 100}k"
+    q, r = divmod(x, 1_000_000)
+    return f"{q}M" if r < 100_000 else f"{q}.{r // 100_000}M"
 
 
-def compute_streaks(days: List[Tuple[str,int]]):
-    if not days:
+def compute_streaks(dates: List[str], counts: List[int]):
+    if not counts:
         return 0, 0, None, None
-    cur = 0
-    i = len(days) - 1
-    while i >= 0 and days[i][1] > 0:
-        cur += 1
-        i -= 1
+    if _np is not None:
+        arr = _np.asarray(counts, dtype=_np.int32)
+        mask = arr > 0
+        zeros_from_end = _np.flatnonzero(~mask[::-1])
+        cur = int(zeros_from_end[0]) if zeros_from_end.size else len(counts)
+        # Run length at i = i - index of the most recent zero (reset-on-zero).
+        idx = _np.arange(len(mask))
+        last_zero = _np.maximum.accumulate(_np.where(mask, -1, idx))
+        run = _np.where(mask, idx - last_zero, 0)
+        longest = int(run.max())
+        if longest == 0:
+            return cur, 0, None, None
+        end_i = int(run.argmax())
+        start_i = end_i - longest + 1
+        return cur, longest, dates[start_i], dates[end_i]
+    # Single tail-to-head pass: the first run closed is the current streak,
+    # and runs are compared with >= so ties resolve to the earliest run, like
+    # the forward/numpy variants. Bail out once even a run swallowing every
+    # unseen day could not tie the longest.
+    cur = None
     longest = 0
     best_start = None
     best_end = None
     run = 0
-    run_start = None
-    for d, c in days:
-        if c > 0:
-            if run == 0:
-                run_start = d
+    for i in range(len(counts) - 1, -1, -1):
+        if counts[i] > 0:
             run += 1
-            if run > longest:
-                longest = run
-                best_start = run_start
-                best_end = d
-        else:
-            run = 0
-            run_start = None
+            continue
+        if cur is None:
+            cur = run
+        if run and run >= longest:
+            longest = run
+            best_start = dates[i + 1]
+            best_end = dates[i + run]
+        run = 0
+        if run + i < longest:
+            break
+    else:
+        if run >= longest and run:
+            longest = run
+            best_start = dates[0]
+            best_end = dates[run - 1]
+    if cur is None:
+        cur = run if counts[-1] > 0 else 0
     return cur, longest, best_start, best_end
 
 
@@ -208,68 +404,71 @@ def signal_score(active_days_year: int, total_contrib_year: int) -> float:
     return max(0.0, min(1.0, score))
 
 
-def build_svg(m: Metrics) -> str:
-    W, H = 1200, 560
-    updated = m.updated
+def derive_metrics(m: dict) -> dict:
+    """Fill in the scalars build_svg renders (streaks, active days, signal).
 
-    cur_streak, long_streak, long_start, long_end = compute_streaks(m.days_year)
-    active_days_year = sum(1 for _,c in m.days_year if c>0)
-    prog = signal_score(active_days_year, m.contrib_year)
-
-    r = 54
-    circ = 2*math.pi*r
-    dash = prog * circ
-    gap = circ - dash
-    pct = int(round(prog * 100))
-
-    counts_30 = [c for _,c in (m.days_30 or [])][-28:]
-    if len(counts_30) < 28:
-        counts_30 = [0]*(28-len(counts_30)) + counts_30
-    mn0, mx0 = min(counts_30), max(counts_30)
-    mn, mx = mn0, mx0
-    flat = (mx == mn)
-    if flat:
-        mx = mn + 1
-
-    left_x, left_y, left_w, left_h = 52, 140, 580, 360
-    rt_x, rt_y, rt_w, rt_h = 650, 140, 510, 170
-    rb_x, rb_y, rb_w, rb_h = 650, 330, 510, 170
-
-    pad = 24
-    chart_y = 58
-    chart_w = rb_w - 2*pad
-    chart_h = rb_h - 92
-
-    # RELATIVE coords inside cadence group
-    x0, y0, w, h = 0, chart_y, chart_w, chart_h
-    pts = []
-    for i, v in enumerate(counts_30):
-        x = x0 + (w * (i/(len(counts_30)-1)))
-        y = y0 + h - (h*((v-mn)/(mx-mn)))
-        if flat:
-            y = y0 + h - 1.0
-        pts.append((x,y))
-    path = "M " + " L ".join([f"{x:.1f},{y:.1f}" for x,y in pts])
-    area = path + f" L {pts[-1][0]:.1f},{y0+h:.1f} L {pts[0][0]:.1f},{y0+h:.1f} Z"
-
-    stars = _fmt_num(m.stars)
-    commits = _fmt_num(m.commits_year)
-    prs = _fmt_num(m.prs_year)
-    issues = _fmt_num(m.issues_year)
-    contrib = _fmt_num(m.contrib_year)
-
-    active_days = _fmt_num(active_days_year)
-    cur_s = _fmt_num(cur_streak)
-    long_s = _fmt_num(long_streak)
-    long_range = f"{long_start} → {long_end}" if long_start and long_end else ""
-
-    ring_cx, ring_cy = left_x + left_w - 150, left_y + 150
-    list_x, list_y = left_x + 32, left_y + 58
-    value_x = ring_cx - r - 18
-    if value_x < list_x + 320:
-        value_x = list_x + 320
-
-    return f"""<?xml version="1.0" encoding="UTF-8"?>
+    Idempotent, so main() can also apply it to a cached .metrics.json written
+    before these keys existed.
+    """
+    if "signal" in m:
+        return m
+    cur_streak, long_streak, long_start, long_end = compute_streaks(m["dates_year"], m["counts_year"])
+    if _np is not None:
+        active_days = int((_np.asarray(m["counts_year"], dtype=_np.int32) > 0).sum())
+    else:
+        active_days = sum(1 for c in m["counts_year"] if c > 0)
+    m["active_days_year"] = active_days
+    m["cur_streak"] = cur_streak
+    m["long_streak"] = long_streak
+    m["long_range"] = f"{long_start} → {long_end}" if long_start and long_end else ""
+    m["signal"] = signal_score(active_days, m["contrib_year"])
+    return m
+
+
+# ---- SVG layout (static geometry, baked into the template at import) ----
+
+W, H = 1200, 560
+RING_R = 54
+RING_CIRC = 2 * math.pi * RING_R
+
+LEFT_X, LEFT_Y, LEFT_W, LEFT_H = 52, 140, 580, 360
+RT_X, RT_Y, RT_W, RT_H = 650, 140, 510, 170
+RB_X, RB_Y, RB_W, RB_H = 650, 330, 510, 170
+
+PAD = 24
+CHART_Y = 58
+CHART_W = RB_W - 2 * PAD
+CHART_H = RB_H - 92
+
+RING_CX, RING_CY = LEFT_X + LEFT_W - 150, LEFT_Y + 150
+LIST_X, LIST_Y = LEFT_X + 32, LEFT_Y + 58
+VALUE_X = max(RING_CX - RING_R - 18, LIST_X + 320)
+
+
+# (y offset, dot color, label, template token) for the overview list; one
+# row template below replaces five copies of the same markup.
+_OVERVIEW_ROWS = [
+    (0, "#ff4d8d", "Total Stars Earned", "$stars"),
+    (38, "#3b82f6", "Total Commits", "$commits"),
+    (76, "#22c55e", "Total PRs", "$prs"),
+    (114, "#f59e0b", "Total Issues", "$issues"),
+    (152, "#a78bfa", "Total Contributions", "$contrib"),
+]
+
+
+def _compile_svg_template() -> string.Template:
+    # ~90% of the SVG is static; evaluate all geometry once and leave only
+    # $-placeholders for per-run data, so build_svg is a pure substitution.
+    vx = VALUE_X - LIST_X
+    overview_rows = "\n    ".join(
+        f'''<g transform="translate(0,{dy})">
+      <circle cx="10" cy="12" r="5" fill="{color}"/>
+      <text class="label" x="26" y="0" dominant-baseline="hanging">{label}</text>
+      <text class="value" x="{vx:.0f}" y="-1" text-anchor="end" dominant-baseline="hanging">{token}</text>
+    </g>'''
+        for dy, color, label, token in _OVERVIEW_ROWS
+    )
+    return string.Template(f"""<?xml version="1.0" encoding="UTF-8"?>
 <svg xmlns="http://www.w3.org/2000/svg" width="{W}" height="{H}" viewBox="0 0 {W} {H}" role="img" aria-label="GitHub Engineering Metrics (self-hosted)">
   <defs>
     <linearGradient id="bg" x1="0" x2="1" y1="0" y2="1">
@@ -293,14 +492,18 @@ def build_svg(m: Metrics) -> str:
     <filter id="shadow" x="-20%" y="-20%" width="140%" height="140%">
       <feDropShadow dx="0" dy="10" stdDeviation="18" flood-color="#000000" flood-opacity="0.35"/>
     </filter>
+    <symbol id="panel" overflow="visible">
+      <rect class="card" x="0" y="0" width="100%" height="100%" rx="18"/>
+    </symbol>
     <style>
-      .h1{{font:900 28px -apple-system,BlinkMacSystemFont,Segoe UI,Helvetica,Arial,sans-serif; fill:#e5e7eb}}
-      .sub{{font:650 12px -apple-system,BlinkMacSystemFont,Segoe UI,Helvetica,Arial,sans-serif; fill:#9ca3af}}
+      :root{{--f:-apple-system,BlinkMacSystemFont,Segoe UI,Helvetica,Arial,sans-serif}}
+      .h1{{font:900 28px var(--f); fill:#e5e7eb}}
+      .sub{{font:650 12px var(--f); fill:#9ca3af}}
       .mono{{font:650 11px ui-monospace,SFMono-Regular,Menlo,Monaco,Consolas,"Liberation Mono","Courier New",monospace; fill:#9ca3af}}
-      .label{{font:650 12px -apple-system,BlinkMacSystemFont,Segoe UI,Helvetica,Arial,sans-serif; fill:#cbd5e1}}
-      .value{{font:900 16px -apple-system,BlinkMacSystemFont,Segoe UI,Helvetica,Arial,sans-serif; fill:#e5e7eb}}
-      .big{{font:900 34px -apple-system,BlinkMacSystemFont,Segoe UI,Helvetica,Arial,sans-serif; fill:#e5e7eb}}
-      .small{{font:650 11px -apple-system,BlinkMacSystemFont,Segoe UI,Helvetica,Arial,sans-serif; fill:#9ca3af}}
+      .label{{font:650 12px var(--f); fill:#cbd5e1}}
+      .value{{font:900 16px var(--f); fill:#e5e7eb}}
+      .big{{font:900 34px var(--f); fill:#e5e7eb}}
+      .small{{font:650 11px var(--f); fill:#9ca3af}}
       .card{{fill:url(#card); stroke:#1f2937; stroke-width:1}}
       .sep{{stroke:#1f2937; stroke-width:1}}
       .grid{{stroke:#1f2937; stroke-width:1}}
@@ -313,112 +516,202 @@ def build_svg(m: Metrics) -> str:
     <text class="h1" x="0" y="0" dominant-baseline="hanging">Hananiah Hsu · Stats</text>
     <text class="sub" x="0" y="38" dominant-baseline="hanging">Self-hosted metrics · generated by GitHub Actions · no third-party render</text>
     <rect x="0" y="68" width="520" height="6" rx="3" fill="url(#accent)"/>
-    <text class="mono" x="1096" y="71" text-anchor="end" dominant-baseline="middle">updated {updated}</text>
+    <text class="mono" x="1096" y="71" text-anchor="end" dominant-baseline="middle">updated $updated</text>
   </g>
 
-  <g filter="url(#shadow)"><rect class="card" x="{left_x}" y="{left_y}" width="{left_w}" height="{left_h}" rx="18"/></g>
-  <g filter="url(#shadow)"><rect class="card" x="{rt_x}" y="{rt_y}" width="{rt_w}" height="{rt_h}" rx="18"/></g>
-  <g filter="url(#shadow)"><rect class="card" x="{rb_x}" y="{rb_y}" width="{rb_w}" height="{rb_h}" rx="18"/></g>
+  <use href="#panel" x="{LEFT_X}" y="{LEFT_Y}" width="{LEFT_W}" height="{LEFT_H}" filter="url(#shadow)"/>
+  <use href="#panel" x="{RT_X}" y="{RT_Y}" width="{RT_W}" height="{RT_H}" filter="url(#shadow)"/>
+  <use href="#panel" x="{RB_X}" y="{RB_Y}" width="{RB_W}" height="{RB_H}" filter="url(#shadow)"/>
 
-  <text class="label" x="{list_x}" y="{left_y+26}" dominant-baseline="hanging">Overview (last year)</text>
+  <text class="label" x="{LIST_X}" y="{LEFT_Y+26}" dominant-baseline="hanging">Overview (last year)</text>
 
-  <g transform="translate({list_x},{list_y})">
-    <g transform="translate(0,0)">
-      <circle cx="10" cy="12" r="5" fill="#ff4d8d"/>
-      <text class="label" x="26" y="0" dominant-baseline="hanging">Total Stars Earned</text>
-      <text class="value" x="{value_x-list_x:.1f}" y="-1" text-anchor="end" dominant-baseline="hanging">{stars}</text>
-    </g>
-    <g transform="translate(0,38)">
-      <circle cx="10" cy="12" r="5" fill="#3b82f6"/>
-      <text class="label" x="26" y="0" dominant-baseline="hanging">Total Commits</text>
-      <text class="value" x="{value_x-list_x:.1f}" y="-1" text-anchor="end" dominant-baseline="hanging">{commits}</text>
-    </g>
-    <g transform="translate(0,76)">
-      <circle cx="10" cy="12" r="5" fill="#22c55e"/>
-      <text class="label" x="26" y="0" dominant-baseline="hanging">Total PRs</text>
-      <text class="value" x="{value_x-list_x:.1f}" y="-1" text-anchor="end" dominant-baseline="hanging">{prs}</text>
-    </g>
-    <g transform="translate(0,114)">
-      <circle cx="10" cy="12" r="5" fill="#f59e0b"/>
-      <text class="label" x="26" y="0" dominant-baseline="hanging">Total Issues</text>
-      <text class="value" x="{value_x-list_x:.1f}" y="-1" text-anchor="end" dominant-baseline="hanging">{issues}</text>
-    </g>
-    <g transform="translate(0,152)">
-      <circle cx="10" cy="12" r="5" fill="#a78bfa"/>
-      <text class="label" x="26" y="0" dominant-baseline="hanging">Total Contributions</text>
-      <text class="value" x="{value_x-list_x:.1f}" y="-1" text-anchor="end" dominant-baseline="hanging">{contrib}</text>
-    </g>
+  <g transform="translate({LIST_X},{LIST_Y})">
+    {overview_rows}
   </g>
 
-  <line class="sep" x1="{list_x}" y1="{left_y+260}" x2="{left_x+left_w-32}" y2="{left_y+260}"/>
-  <text class="small" x="{list_x}" y="{left_y+280}" dominant-baseline="hanging">Signal is derived from active days + total contributions in the last year.</text>
+  <line class="sep" x1="{LIST_X}" y1="{LEFT_Y+260}" x2="{LEFT_X+LEFT_W-32}" y2="{LEFT_Y+260}"/>
+  <text class="small" x="{LIST_X}" y="{LEFT_Y+280}" dominant-baseline="hanging">Signal is derived from active days + total contributions in the last year.</text>
 
   <g>
-    <circle cx="{ring_cx}" cy="{ring_cy}" r="{r}" fill="none" stroke="#1f2937" stroke-width="10"/>
-    <circle cx="{ring_cx}" cy="{ring_cy}" r="{r}" fill="none" stroke="#ff4d8d" stroke-width="10"
-            stroke-linecap="round" transform="rotate(-90 {ring_cx} {ring_cy})"
-            stroke-dasharray="{dash:.2f} {gap:.2f}"/>
-    <text class="big" x="{ring_cx}" y="{ring_cy-10}" text-anchor="middle" dominant-baseline="middle">{pct}%</text>
-    <text class="small" x="{ring_cx}" y="{ring_cy+22}" text-anchor="middle" dominant-baseline="middle">signal</text>
+    <circle cx="{RING_CX}" cy="{RING_CY}" r="{RING_R}" fill="none" stroke="#1f2937" stroke-width="10"/>
+    <circle cx="{RING_CX}" cy="{RING_CY}" r="{RING_R}" fill="none" stroke="#ff4d8d" stroke-width="10"
+            stroke-linecap="round" transform="rotate(-90 {RING_CX} {RING_CY})"
+            stroke-dasharray="$dash $gap"/>
+    <text class="big" x="{RING_CX}" y="{RING_CY-10}" text-anchor="middle" dominant-baseline="middle">$pct%</text>
+    <text class="small" x="{RING_CX}" y="{RING_CY+22}" text-anchor="middle" dominant-baseline="middle">signal</text>
   </g>
 
-  <g transform="translate({rt_x+32},{rt_y+26})">
+  <g transform="translate({RT_X+32},{RT_Y+26})">
     <text class="label" x="0" y="0" dominant-baseline="hanging">Consistency</text>
 
     <g transform="translate(0,54)">
-      <text class="big" x="0" y="0" dominant-baseline="hanging">{active_days}</text>
+      <text class="big" x="0" y="0" dominant-baseline="hanging">$active_days</text>
       <text class="small" x="0" y="44" dominant-baseline="hanging">Active days (1y)</text>
     </g>
     <g transform="translate(170,54)">
-      <text class="big" x="0" y="0" dominant-baseline="hanging">{cur_s}</text>
+      <text class="big" x="0" y="0" dominant-baseline="hanging">$cur_s</text>
       <text class="small" x="0" y="44" dominant-baseline="hanging">Current streak (days)</text>
     </g>
     <g transform="translate(340,54)">
-      <text class="big" x="0" y="0" dominant-baseline="hanging">{long_s}</text>
+      <text class="big" x="0" y="0" dominant-baseline="hanging">$long_s</text>
       <text class="small" x="0" y="44" dominant-baseline="hanging">Longest streak (1y)</text>
-      <text class="mono" x="0" y="70" dominant-baseline="hanging">{long_range}</text>
+      <text class="mono" x="0" y="70" dominant-baseline="hanging">$long_range</text>
     </g>
   </g>
 
-  <g transform="translate({rb_x+pad},{rb_y+pad})">
+  <g transform="translate({RB_X+PAD},{RB_Y+PAD})">
     <text class="label" x="0" y="0" dominant-baseline="hanging">Cadence</text>
     <text class="small" x="0" y="22" dominant-baseline="hanging">Daily contributions (last 28 days)</text>
-    <text class="mono" x="{rb_w-2*pad}" y="0" text-anchor="end" dominant-baseline="hanging">min {mn0} · max {mx0}</text>
+    <text class="mono" x="{CHART_W}" y="0" text-anchor="end" dominant-baseline="hanging">min $mn0 · max $mx0</text>
 
     <g opacity="0.70">
-      <line class="grid" x1="0" y1="{chart_y+18}" x2="{chart_w}" y2="{chart_y+18}"/>
-      <line class="grid" x1="0" y1="{chart_y+chart_h/2:.1f}" x2="{chart_w}" y2="{chart_y+chart_h/2:.1f}"/>
-      <line class="grid" x1="0" y1="{chart_y+chart_h:.1f}" x2="{chart_w}" y2="{chart_y+chart_h:.1f}"/>
+      <line class="grid" x1="0" y1="{CHART_Y+18}" x2="{CHART_W}" y2="{CHART_Y+18}"/>
+      <line class="grid" x1="0" y1="{CHART_Y+CHART_H/2:.0f}" x2="{CHART_W}" y2="{CHART_Y+CHART_H/2:.0f}"/>
+      <line class="grid" x1="0" y1="{CHART_Y+CHART_H:.0f}" x2="{CHART_W}" y2="{CHART_Y+CHART_H:.0f}"/>
     </g>
 
-    <path d="{area}" fill="url(#sparkFill)"/>
-    <path d="{path}" fill="none" stroke="#e5e7eb" stroke-width="2.8" stroke-linecap="round" stroke-linejoin="round" opacity="0.95"/>
-    <circle cx="{pts[-1][0]:.1f}" cy="{pts[-1][1]:.1f}" r="4.8" fill="#ff4d8d"/>
+    <path d="$area" fill="url(#sparkFill)"/>
+    <path d="$path" fill="none" stroke="#e5e7eb" stroke-width="2.8" stroke-linecap="round" stroke-linejoin="round" opacity="0.95"/>
+    <circle cx="$last_cx" cy="$last_cy" r="4.8" fill="#ff4d8d"/>
   </g>
 </svg>
-"""
+""")
 
 
-def build_metrics(token: str, user: str, stars_scope: str) -> Metrics:
-    now = _dt.datetime.utcnow()
-    to = now.isoformat() + "Z"
-    from_year = (now - _dt.timedelta(days=365)).isoformat() + "Z"
-    from_30 = (now - _dt.timedelta(days=30)).isoformat() + "Z"
-
-    contrib_y, commits_y, prs_y, issues_y, days_y = fetch_contrib_window(token, user, from_year, to)
-    _, _, _, _, days_30 = fetch_contrib_window(token, user, from_30, to)
-    stars = fetch_total_stars(token, user, scope=stars_scope)
-
-    return Metrics(
-        updated=_dt.date.today().isoformat(),
-        stars=stars,
-        commits_year=commits_y,
-        prs_year=prs_y,
-        issues_year=issues_y,
-        contrib_year=contrib_y,
-        days_year=days_y,
-        days_30=days_30,
+_SVG_TEMPLATE = _compile_svg_template()
+
+
+def build_svg(m: dict, minify: bool = False) -> str:
+    # Derived scalars are precomputed by derive_metrics; this is a pure
+    # formatter over the metrics dict.
+    prog = m["signal"]
+
+    dash = prog * RING_CIRC
+    gap = RING_CIRC - dash
+    pct = int(round(prog * 100))
+
+    counts_30 = (m["counts_30"] or [])[-28:]
+    if len(counts_30) < 28:
+        counts_30 = [0] * (28 - len(counts_30)) + counts_30
+    if _np is not None:
+        arr30 = _np.asarray(counts_30, dtype=_np.float64)
+        mn0, mx0 = int(arr30.min()), int(arr30.max())
+    else:
+        # One fused scan instead of separate min()/max() walks.
+        mn0 = mx0 = counts_30[0]
+        for c in counts_30[1:]:
+            if c < mn0:
+                mn0 = c
+            elif c > mx0:
+                mx0 = c
+    flat = (mx0 == mn0)
+    # Clamp the denominator instead of faking mx = mn + 1; flat windows still
+    # get the 1px-above-baseline override below.
+    denom = float(max(mx0 - mn0, 1))
+
+    # RELATIVE coords inside cadence group
+    x0, y0, w, h = 0, CHART_Y, CHART_W, CHART_H
+    if _np is not None:
+        xs = x0 + _np.linspace(0.0, w, len(counts_30))
+        # Same (v - mn) * (h / denom) ordering as the fallback loop so both
+        # branches produce bit-identical coordinates.
+        ys = (y0 + h) - (arr30 - mn0) * (h / denom)
+        if flat:
+            ys[:] = y0 + h - 1.0
+        pts = list(zip(xs.tolist(), ys.tolist()))
+    else:
+        # Branch hoisted out of the loop: flat windows take a constant-y
+        # comprehension, otherwise one precomputed scale replaces the
+        # per-sample division.
+        n = len(counts_30)
+        base = y0 + h
+        if flat:
+            pts = [(x0 + w * (i / (n - 1)), base - 1.0) for i in range(n)]
+        else:
+            k = h / denom
+            pts = [(x0 + w * (i / (n - 1)), base - (v - mn0) * k)
+                   for i, v in enumerate(counts_30)]
+    if minify:
+        # Relative commands + integer coords shrink the path data ~50%; track
+        # the rounded cursor so rounding error does not accumulate per segment.
+        rx, ry = round(pts[0][0]), round(pts[0][1])
+        parts = [f"M{rx},{ry}"]
+        for x, y in pts[1:]:
+            nx, ny = round(x), round(y)
+            parts.append(f"l{nx-rx},{ny-ry}")
+            rx, ry = nx, ny
+        path = "".join(parts)
+        area = path + f"L{round(pts[-1][0])},{y0+h}L{round(pts[0][0])},{y0+h}Z"
+        last_cx, last_cy = str(rx), str(ry)
+    else:
+        fmt = "{:.1f},{:.1f}".format  # hoisted; one bound method instead of an f-string per point
+        parts = ["M ", fmt(*pts[0])]
+        for p in pts[1:]:
+            parts.append(" L ")
+            parts.append(fmt(*p))
+        path = "".join(parts)
+        area = path + " L " + fmt(pts[-1][0], y0 + h) + " L " + fmt(pts[0][0], y0 + h) + " Z"
+        last_cx, last_cy = f"{pts[-1][0]:.1f}", f"{pts[-1][1]:.1f}"
+
+    return _SVG_TEMPLATE.substitute(
+        updated=m["updated"],
+        stars=_fmt_num(m["stars"]),
+        commits=_fmt_num(m["commits_year"]),
+        prs=_fmt_num(m["prs_year"]),
+        issues=_fmt_num(m["issues_year"]),
+        contrib=_fmt_num(m["contrib_year"]),
+        active_days=_fmt_num(m["active_days_year"]),
+        cur_s=_fmt_num(m["cur_streak"]),
+        long_s=_fmt_num(m["long_streak"]),
+        long_range=m["long_range"],
+        pct=pct,
+        dash=f"{dash:.2f}",
+        gap=f"{gap:.2f}",
+        path=path,
+        area=area,
+        mn0=mn0,
+        mx0=mx0,
+        last_cx=last_cx,
+        last_cy=last_cy,
+    )
+
+
+def _iso_z(ts: _dt.datetime) -> str:
+    # GitHub accepts the Z suffix; second precision keeps the variables short.
+    return ts.isoformat(timespec="seconds").replace("+00:00", "Z")
+
+
+def build_metrics(token: str, user: str, stars_scope: str) -> dict:
+    _SESSION.headers.update({"Authorization": f"Bearer {token}", "Accept": "application/vnd.github+json"})
+
+    now = _dt.datetime.now(_dt.timezone.utc)
+    to = _iso_z(now)
+    from_year = _iso_z(now - _dt.timedelta(days=365))
+
+    affiliations = SCOPE_AFFILIATIONS.get(stars_scope)
+    # Everything rides in one GraphQL document (year window plus first repo
+    # page); only star pagination beyond page 1 costs further round-trips.
+    contrib_y, commits_y, prs_y, issues_y, dates_y, counts_y, repos_page = fetch_contrib_window(
+        user, from_year, to, repos_affiliations=affiliations
     )
+    stars = fetch_total_stars(user, scope=stars_scope, first_page=repos_page)
+    # The year calendar ends today, so its tail is exactly the last-30-days
+    # sparkline window — no second selection needed.
+    counts_30 = counts_y[-30:]
+
+    # Plain dict: build_svg is the only consumer, so a dataclass hop between
+    # the two buys nothing.
+    return derive_metrics({
+        "updated": _dt.date.today().isoformat(),
+        "stars": stars,
+        "commits_year": commits_y,
+        "prs_year": prs_y,
+        "issues_year": issues_y,
+        "contrib_year": contrib_y,
+        "dates_year": dates_y,
+        "counts_year": counts_y,
+        "counts_30": counts_30,
+    })
 
 
 def main() -> int:
@@ -426,19 +719,98 @@ def main() -> int:
     ap.add_argument("--user", required=True)
     ap.add_argument("--out", required=True)
     ap.add_argument("--stars-scope", default="affiliated", choices=["owned","affiliated","contributed","all"], help="Which repos to include when summing stars")
+    ap.add_argument("--cache-dir", default=os.environ.get("METRICS_CACHE_DIR"), help="Directory for the ETag response cache (disabled when unset)")
+    ap.add_argument("--minify", action="store_true", help="Emit relative/integer sparkline path data (smaller SVG, less readable)")
+    ap.add_argument("--no-refetch-cache", action="store_true", help="Skip the same-day metrics cache and always hit the API")
     args = ap.parse_args()
 
+    if args.cache_dir:
+        global _CACHE_DIR
+        _CACHE_DIR = args.cache_dir
+        os.makedirs(_CACHE_DIR, exist_ok=True)
+
     token = os.environ.get("GITHUB_TOKEN") or os.environ.get("METRICS_TOKEN")
     if not token:
         print("ERROR: missing GITHUB_TOKEN (or METRICS_TOKEN) in environment.", file=sys.stderr)
         return 2
 
-    m = build_metrics(token, args.user, args.stars_scope)
-    svg = build_svg(m)
-
-    os.makedirs(os.path.dirname(args.out), exist_ok=True)
-    with open(args.out, "w", encoding="utf-8") as f:
-        f.write(svg)
+    out_dir = os.path.dirname(args.out)
+    os.makedirs(out_dir, exist_ok=True)
+    # Sibling state: last metrics payload (degraded-mode render source) and
+    # its hash (no-change short-circuit for same-day re-runs/retries).
+    state_path = os.path.join(out_dir, ".metrics.json")
+    sha_path = os.path.join(out_dir, ".metrics.sha")
+
+    # Same-day metrics cache: a (user, date)-keyed snapshot in --cache-dir
+    # lets re-runs (SVG tweaking, Actions retries) skip the API entirely.
+    day_path = None
+    if _CACHE_DIR and not args.no_refetch_cache:
+        day_path = os.path.join(_CACHE_DIR, f"metrics-{args.user}-{_dt.date.today().isoformat()}.json")
+    m = None
+    if day_path:
+        try:
+            with open(day_path, "r", encoding="utf-8") as f:
+                m = json.load(f)
+            print(f"OK: reusing same-day metrics from {day_path}", file=sys.stderr)
+        except (OSError, ValueError):
+            m = None
+
+    if m is None:
+        try:
+            try:
+                m = build_metrics(token, args.user, args.stars_scope)
+            finally:
+                _SESSION.close()
+        except (requests.RequestException, RuntimeError) as e:
+            try:
+                with open(state_path, "r", encoding="utf-8") as f:
+                    m = json.load(f)
+            except (OSError, ValueError):
+                print(f"ERROR: fetch failed and no cached metrics at {state_path}: {e}", file=sys.stderr)
+                return 1
+            print(f"WARN: fetch failed ({e}); rendering from cached metrics", file=sys.stderr)
+            m = derive_metrics(m)  # older caches predate the derived keys
+        else:
+            for path in filter(None, (state_path, day_path)):
+                tmp = path + ".tmp"
+                with open(tmp, "w", encoding="utf-8") as f:
+                    json.dump(m, f)
+                os.replace(tmp, path)
+
+    digest = hashlib.sha256(json.dumps(m, sort_keys=True).encode("utf-8")).hexdigest()
+    try:
+        with open(sha_path, "r", encoding="utf-8") as f:
+            prev_digest = f.read().strip()
+    except OSError:
+        prev_digest = None
+    if prev_digest == digest and os.path.exists(args.out):
+        print(f"OK: unchanged {args.out} (metrics hash)")
+        return 0
+
+    svg = build_svg(m, minify=args.minify)
+    data = svg.encode("utf-8")  # encode once; compare and write raw bytes
+    try:
+        with open(args.out, "rb") as f:
+            existing = f.read()
+    except FileNotFoundError:
+        existing = None
+    if existing == data:
+        # No content change: leave mtime alone so the Actions commit step sees
+        # a clean tree instead of committing an identical file.
+        print(f"OK: unchanged {args.out}")
+        return 0
+
+    # Raw fd, one os.write: no TextIOWrapper/buffer layer for a payload this
+    # small, and the tmp+replace keeps the swap atomic.
+    tmp = args.out + ".tmp"
+    fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        os.write(fd, data)
+    finally:
+        os.close(fd)
+    os.replace(tmp, args.out)
+    with open(sha_path, "w", encoding="utf-8") as f:
+        f.write(digest + "\n")
 
     print(f"OK: wrote {args.out}")
     return 0